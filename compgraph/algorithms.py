@@ -63,10 +63,10 @@ def pmi_graph(input_stream_name: str, doc_column: str = 'doc_id', text_column: s
 
     count_w_column: str = 'count_w'
     filter_words = (split_word
-                    .map(ops.Filter(lambda row: len(row[text_column]) > 4))
+                    .map(ops.Filter(lambda row: len(row[text_column]) > 4, [text_column]))
                     .sort([doc_column, text_column])
                     .reduce(ops.Count(count_w_column), [doc_column, text_column])
-                    .map(ops.Filter(lambda row: row[count_w_column] >= 2))
+                    .map(ops.Filter(lambda row: row[count_w_column] >= 2, [count_w_column]))
                     .map(ops.Project([doc_column, text_column])))
 
     correct_words = (split_word
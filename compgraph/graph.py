@@ -1,4 +1,3 @@
-import copy
 import json
 import typing as tp
 
@@ -7,68 +6,81 @@ from .operations import map_op
 from .operations import reduce_op
 from .operations import ExternalSort
 from .operations import join_op
+from .optimizer import count_consumers, optimize
+from .plan import Node
 
 
 class Graph:
     """Computational graph implementation"""
 
-    def __init__(self) -> None:
-        self.__op: list[ops.Operation] = list()
-        self._join_graphs: list[Graph] = list()
+    def __init__(self, node: Node) -> None:
+        """
+        :param node: last node of the graph execution plan
+        """
+        self._node = node
 
     @staticmethod
-    def graph_from(name: str, from_file: bool) -> 'Graph':
+    def graph_from(name: str, from_file: bool, sorted_by: tp.Sequence[str] = tuple(), reverse: bool = False) -> 'Graph':
         """Construct new graph which reads data from row iterator (in form of sequence of Rows
         from 'kwargs' passed to 'run' method) into graph data-flow
         Use ops.ReadIterFactory
         :param name: name of kwarg to use as data source
         :param from_file: is graph from file or from iter
+        :param sorted_by: keys data is known to be sorted by
+        :param reverse: is data sorted in reverse order
         """
         if from_file:
-            return Graph.graph_from_file(name, json.loads)
+            return Graph.graph_from_file(name, json.loads, sorted_by, reverse)
         else:
-            return Graph.graph_from_iter(name)
+            return Graph.graph_from_iter(name, sorted_by, reverse)
 
     @staticmethod
-    def graph_from_iter(name: str) -> 'Graph':
+    def graph_from_iter(name: str, sorted_by: tp.Sequence[str] = tuple(), reverse: bool = False) -> 'Graph':
         """Construct new graph which reads data from row iterator (in form of sequence of Rows
         from 'kwargs' passed to 'run' method) into graph data-flow
         Use ops.ReadIterFactory
         :param name: name of kwarg to use as data source
+        :param sorted_by: keys data is known to be sorted by, lets the graph skip sorting it again
+        :param reverse: is data sorted in reverse order
         """
-        graph = Graph()
-        graph.__op.append(ops.ReadIterFactory(name))
-
-        return graph
+        return Graph(Node(ops.ReadIterFactory(name, tuple((key, reverse) for key in sorted_by))))
 
     @staticmethod
-    def graph_from_file(filename: str, parser: tp.Callable[[str], ops.TRow]) -> 'Graph':
+    def graph_from_file(filename: str, parser: tp.Callable[[str], ops.TRow], sorted_by: tp.Sequence[str] = tuple(),
+                        reverse: bool = False) -> 'Graph':
         """Construct new graph extended with operation for reading rows from file
         Use ops.Read
         :param filename: filename to read from
         :param parser: parser from string to Row
+        :param sorted_by: keys file rows are known to be sorted by, lets the graph skip sorting them again
+        :param reverse: are rows sorted in reverse order
         """
-        graph = Graph()
-        graph.__op.append(ops.Read(filename, parser))
-
-        return graph
+        return Graph(Node(ops.Read(filename, parser, tuple((key, reverse) for key in sorted_by))))
 
-    def map(self, mapper: map_op.Mapper) -> 'Graph':
+    def map(self, mapper: map_op.Mapper, workers: int | None = None, chunk_size: int = 1000,
+            ordered: bool = True) -> 'Graph':
         """Construct new graph extended with map operation with particular mapper
         :param mapper: mapper to use
+        :param workers: number of worker processes to map rows in parallel (see ops.ParallelMap)
+        :param chunk_size: number of rows sent to a worker at once
+        :param ordered: keep order of rows when mapping in parallel
         """
-        new_self = copy.deepcopy(self)
-        new_self.__op.append(map_op.Map(mapper))
-        return new_self
+        if workers is None:
+            return Graph(Node(map_op.Map(mapper), (self._node,)))
+        return Graph(Node(map_op.ParallelMap(mapper, workers, chunk_size, ordered), (self._node,)))
 
-    def reduce(self, reducer: reduce_op.Reducer, keys: tp.Sequence[str]) -> 'Graph':
+    def reduce(self, reducer: reduce_op.Reducer, keys: tp.Sequence[str], partitions: int | None = None,
+               merge: bool = True) -> 'Graph':
         """Construct new graph extended with reduce operation with particular reducer
         :param reducer: reducer to use
         :param keys: keys for grouping
+        :param partitions: number of hash partitions reduced in parallel (see ops.ShuffleReduce);
+            input rows don't have to be sorted in this case
+        :param merge: merge results of partitions so they are sorted by keys
         """
-        new_self = copy.deepcopy(self)
-        new_self.__op.append(reduce_op.Reduce(reducer, keys))
-        return new_self
+        if partitions is None:
+            return Graph(Node(reduce_op.Reduce(reducer, keys), (self._node,)))
+        return Graph(Node(reduce_op.ShuffleReduce(reducer, keys, partitions, merge), (self._node,)))
 
     def sort(self, keys: tp.Sequence[str], reverse: bool = False,
              group_keys: tp.Sequence[str] | None = None) -> 'Graph':
@@ -77,9 +89,7 @@ class Graph:
         :param reverse: reverse sorting or not
         :param group_keys: keys for grouping
         """
-        new_self = copy.deepcopy(self)
-        new_self.__op.append(ExternalSort(keys, reverse=reverse, group_keys=group_keys))
-        return new_self
+        return Graph(Node(ExternalSort(keys, reverse=reverse, group_keys=group_keys), (self._node,)))
 
     def join(self, joiner: join_op.Joiner, join_graph: 'Graph', keys: tp.Sequence[str]) -> 'Graph':
         """Construct new graph extended with join operation with another graph
@@ -87,19 +97,27 @@ class Graph:
         :param join_graph: other graph to join with
         :param keys: keys for grouping
         """
-        new_self = copy.deepcopy(self)
-        new_self.__op.append(join_op.Join(joiner, keys))
-        new_self._join_graphs.append(copy.deepcopy(join_graph))
-        return new_self
+        return Graph(Node(join_op.Join(joiner, keys), (self._node, join_graph._node)))
 
     def run(self, **kwargs: tp.Any) -> ops.TRowsIterable:
-        """Single method to start execution; data sources passed as kwargs"""
-        iter_table = self.__op[0](**kwargs)
-        count = 0
-        for op in self.__op[1:]:
-            if type(op) is join_op.Join:
-                iter_table = op(iter_table, self._join_graphs[count].run(**kwargs))
-                count += 1
+        """Single method to start execution; data sources passed as kwargs.
+        The plan is optimized first (see 'optimizer.optimize'). Nodes shared by several consumers (common prefixes
+        of joined graphs or equal data sources) are executed once and split between consumers with ops.Tee
+        """
+        root = optimize(self._node)
+        consumers = count_consumers(root)
+        nodes = list(root.walk())
+
+        streams: dict[tp.Hashable, ops.TRowsIterable | ops.Tee] = dict()
+
+        def open_stream(node: Node) -> ops.TRowsIterable:
+            stream = streams[node.key]
+            return stream.consumer() if isinstance(stream, ops.Tee) else stream
+
+        for node in nodes:
+            if node.parents:
+                iter_table = node.op(*(open_stream(parent) for parent in node.parents))
             else:
-                iter_table = op(iter_table)
-        return iter_table
+                iter_table = node.op(**kwargs)
+            streams[node.key] = ops.Tee(iter_table, consumers[node.key]) if consumers[node.key] > 1 else iter_table
+        return open_stream(root)
@@ -1,13 +1,15 @@
-from .base import Operation, TRow, TRowsIterable, TRowsGenerator, Read, ReadIterFactory
-from .utils import parse_datetime
+from .base import Operation, TRow, TRowsIterable, TRowsGenerator, TOrdering, TColumns, Read, ReadIterFactory
+from .utils import parse_datetime, dump_rows, load_rows, sort_rows
+from .tee_op import Tee
 from .external_sort_op import ExternalSort
-from .map_op import Mapper, Map, DummyMapper, FilterPunctuation, LowerCase, Split, Product, Idf, Filter, Project, \
-    Haversine, ParseTime, TimeDiff
-from .reduce_op import Reducer, Reduce, FirstReducer, TopN, TermFrequency, Count, Sum, MeanSpeed
+from .map_op import Mapper, OneToOneMapper, Map, ParallelMap, FusedMap, DummyMapper, FilterPunctuation, LowerCase, \
+    Split, Product, Idf, Filter, Project, Haversine, ParseTime, TimeDiff
+from .reduce_op import Reducer, Reduce, ShuffleReduce, FirstReducer, TopN, TermFrequency, Count, Sum, MeanSpeed
 from .join_op import Joiner, Join, InnerJoiner, OuterJoiner, LeftJoiner, RightJoiner
 
-__all__ = ['Operation', 'TRow', 'TRowsIterable', 'TRowsGenerator', 'Read', 'ReadIterFactory', 'parse_datetime',
-           'Mapper', 'Map', 'DummyMapper', 'FilterPunctuation', 'LowerCase', 'Split', 'Product', 'Idf', 'Filter',
-           'Project', 'Haversine', 'ParseTime', 'TimeDiff', 'Reducer', 'Reduce', 'FirstReducer', 'TopN',
-           'TermFrequency', 'Count', 'Sum', 'MeanSpeed', 'ExternalSort', 'Joiner', 'Join', 'InnerJoiner', 'OuterJoiner',
-           'LeftJoiner', 'RightJoiner']
+__all__ = ['Operation', 'TRow', 'TRowsIterable', 'TRowsGenerator', 'TOrdering', 'TColumns', 'Read', 'ReadIterFactory',
+           'parse_datetime', 'dump_rows', 'load_rows', 'sort_rows', 'Tee', 'Mapper', 'OneToOneMapper', 'Map',
+           'ParallelMap', 'FusedMap', 'DummyMapper', 'FilterPunctuation', 'LowerCase', 'Split', 'Product', 'Idf',
+           'Filter', 'Project', 'Haversine', 'ParseTime', 'TimeDiff', 'Reducer', 'Reduce', 'ShuffleReduce',
+           'FirstReducer', 'TopN', 'TermFrequency', 'Count', 'Sum', 'MeanSpeed', 'ExternalSort', 'Joiner', 'Join',
+           'InnerJoiner', 'OuterJoiner', 'LeftJoiner', 'RightJoiner']
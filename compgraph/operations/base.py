@@ -4,28 +4,78 @@ import typing as tp
 TRow = dict[str, tp.Any]
 TRowsIterable = tp.Iterable[TRow]
 TRowsGenerator = tp.Generator[TRow, None, None]
+TOrdering = tuple[tuple[str, bool], ...]  # (column, descending) pairs, most significant first
+TColumns = frozenset[str] | None  # set of column names, None if unknown (any column)
 
 
 class Operation(ABC):
     @abstractmethod
     def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator: pass
 
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        """Order of output rows guaranteed by the operation given orders of its inputs
+        :param inputs: orders of input tables
+        """
+        return tuple()
+
+    def output_columns(self, *inputs: TColumns) -> TColumns:
+        """Columns of output rows given columns of input rows
+        :param inputs: columns of input tables
+        """
+        return None
+
+    def required_columns(self, required: TColumns, *inputs: TColumns) -> tuple[TColumns, ...]:
+        """Columns of every input table needed to produce required columns of output rows
+        :param required: columns of output rows needed by consumers
+        :param inputs: columns of input tables
+        """
+        return tuple(None for _ in inputs)
+
 
 class Read(Operation):
-    def __init__(self, filename: str, parser: tp.Callable[[str], TRow]) -> None:
+    def __init__(self, filename: str, parser: tp.Callable[[str], TRow], ordering: TOrdering = tuple()) -> None:
+        """
+        :param filename: filename to read from
+        :param parser: parser from string to Row
+        :param ordering: known order of rows in the file
+        """
         self._filename = filename
         self._parser = parser
+        self._ordering = ordering
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Read) and (self._filename, self._parser) == (other._filename, other._parser)
+
+    def __hash__(self) -> int:
+        return hash((Read, self._filename, self._parser))
 
     def __call__(self, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         with open(self._filename) as f:
             for line in f:
                 yield self._parser(line)
 
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        return self._ordering
+
 
 class ReadIterFactory(Operation):
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, ordering: TOrdering = tuple()) -> None:
+        """
+        :param name: name of kwarg to use as data source
+        :param ordering: known order of rows produced by data source
+        """
         self._name = name
+        self._ordering = ordering
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ReadIterFactory) and self._name == other._name
+
+    def __hash__(self) -> int:
+        return hash((ReadIterFactory, self._name))
 
     def __call__(self, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         for row in kwargs[self._name]():
             yield row
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        return self._ordering
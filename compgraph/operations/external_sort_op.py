@@ -4,7 +4,7 @@ import typing as tp
 from multiprocessing import Pipe, Process, connection
 from operator import itemgetter
 
-from . import Operation, TRowsGenerator, TRowsIterable
+from . import Operation, TColumns, TOrdering, TRowsGenerator, TRowsIterable
 
 
 def do_sort(endpoint: connection.Connection, keys: tuple[str, ...], reverse: bool = False) -> None:
@@ -34,6 +34,40 @@ class ExternalSort(Operation):
         if group_keys is None:
             self._group_keys = []
 
+    @property
+    def keys(self) -> tp.Sequence[str]:
+        return self._keys
+
+    @property
+    def group_keys(self) -> tp.Sequence[str]:
+        assert self._group_keys is not None
+        return self._group_keys
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        keys = tuple((key, self._reverse) for key in self._keys)
+        if not self.group_keys:
+            return keys
+        groups = inputs[0][:len(self.group_keys)]
+        if len(groups) < len(self.group_keys) or {column for column, _ in groups} != set(self.group_keys):
+            return tuple()
+        return groups + keys
+
+    def output_columns(self, *inputs: TColumns) -> TColumns:
+        return inputs[0]
+
+    def required_columns(self, required: TColumns, *inputs: TColumns) -> tuple[TColumns, ...]:
+        if required is None:
+            return (None,)
+        return (required | frozenset(self._keys) | frozenset(self.group_keys),)
+
+    def is_redundant(self, ordering: TOrdering) -> bool:
+        """Whether rows ordered by 'ordering' are already sorted as the operation sorts them
+        (sorting is stable, so it does not change such rows)
+        :param ordering: order of input rows
+        """
+        result = self.ordering(ordering)
+        return len(result) > 0 and ordering[:len(result)] == result
+
     def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         for key, group in itertools.groupby(rows, lambda x: [x[k] for k in self._group_keys]):  # type: ignore
             local_endpoint, remote_endpoint = Pipe()
@@ -3,17 +3,24 @@ import itertools
 from abc import ABC, abstractmethod
 import typing as tp
 
-from . import Operation, TRowsGenerator, TRowsIterable, TRow
+from . import Operation, TColumns, TOrdering, TRowsGenerator, TRowsIterable, TRow
 
 
 class Joiner(ABC):
     """Base class for joiners"""
 
+    # are rows of left (a) and right (b) tables without a pair kept in the result
+    keeps_unmatched: tuple[bool, bool] = (True, True)
+
     def __init__(self, suffix_a: str = '_1', suffix_b: str = '_2') -> None:
         self._a_suffix = suffix_a
         self._b_suffix = suffix_b
         self._duplicates: set[str] = set()
 
+    @property
+    def suffixes(self) -> tuple[str, str]:
+        return self._a_suffix, self._b_suffix
+
     def _do_join(self, keys: tp.Sequence[str], unpacked_a: list[TRow], rows_b: TRowsIterable) -> (
             tp.Generator)[TRow, None, bool]:
         is_empty = True
@@ -95,6 +102,54 @@ class Join(Operation):
         self._keys = keys
         self._joiner = joiner
 
+    @property
+    def joiner(self) -> Joiner:
+        return self._joiner
+
+    @property
+    def keys(self) -> tp.Sequence[str]:
+        return self._keys
+
+    def output_columns(self, *inputs: TColumns) -> TColumns:
+        columns_a, columns_b = inputs
+        if columns_a is None or columns_b is None:
+            return None
+        suffix_a, suffix_b = self._joiner.suffixes
+        duplicates = (columns_a & columns_b) - frozenset(self._keys)
+        return ((columns_a | columns_b) - duplicates | {column + suffix_a for column in duplicates}
+                | {column + suffix_b for column in duplicates})
+
+    def required_columns(self, required: TColumns, *inputs: TColumns) -> tuple[TColumns, ...]:
+        if required is None:
+            return None, None
+        # columns renamed because of a name collision must be kept on both sides for the collision to stay
+        renamed = {column[:-len(suffix)] for suffix in self._joiner.suffixes for column in required
+                   if suffix and column.endswith(suffix)}
+        needed = required | renamed | frozenset(self._keys)
+        return needed, needed
+
+    def filtered_inputs(self, columns: frozenset[str], *inputs: TColumns) -> tuple[bool, bool]:
+        """Inputs which may be filtered instead of the join result by a condition on given columns
+        :param columns: columns the condition depends on
+        :param inputs: columns of input tables
+        """
+        if columns <= frozenset(self._keys):
+            return True, True
+        columns_a, columns_b = inputs
+        if columns_a is None or columns_b is None:
+            return False, False
+        keys = frozenset(self._keys)
+        keeps_a, keeps_b = self._joiner.keeps_unmatched
+        return (not keeps_b and columns <= columns_a and not (columns & columns_b) - keys,
+                not keeps_a and columns <= columns_b and not (columns & columns_a) - keys)
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        """Groups are merged in ascending order of join keys, so rows sorted by the keys stay sorted"""
+        keys = tuple((key, False) for key in self._keys)
+        if keys and all(ordering[:len(keys)] == keys for ordering in inputs):
+            return keys
+        return tuple()
+
     @staticmethod
     @check_sort
     def grouper(rows: TRowsIterable, keys):  # type: ignore[no-untyped-def]
@@ -151,6 +206,8 @@ class Join(Operation):
 class InnerJoiner(Joiner):
     """Join with inner strategy"""
 
+    keeps_unmatched = (False, False)
+
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
         unpacked_a = list(rows_a)
         if len(unpacked_a) > 0:
@@ -160,6 +217,8 @@ class InnerJoiner(Joiner):
 class OuterJoiner(Joiner):
     """Join with outer strategy"""
 
+    keeps_unmatched = (True, True)
+
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
         unpacked_a = list(rows_a)
         if len(unpacked_a) > 0:
@@ -175,6 +234,8 @@ class OuterJoiner(Joiner):
 class LeftJoiner(Joiner):
     """Join with left strategy"""
 
+    keeps_unmatched = (True, False)
+
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
         unpacked_a = list(rows_a)
         if len(unpacked_a) > 0:
@@ -188,6 +249,8 @@ class LeftJoiner(Joiner):
 class RightJoiner(Joiner):
     """Join with right strategy"""
 
+    keeps_unmatched = (False, True)
+
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
         unpacked_a = list(rows_a)
         if len(unpacked_a) > 0:
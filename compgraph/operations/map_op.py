@@ -1,16 +1,52 @@
+import collections
+import itertools
 import math
+import multiprocessing
+import queue
 import string
 import re
 import typing as tp
 from abc import ABC, abstractmethod
 import calendar
 
-from . import Operation, TRow, TRowsGenerator, TRowsIterable, parse_datetime
+from . import Operation, TColumns, TOrdering, TRow, TRowsGenerator, TRowsIterable, parse_datetime
 
 
 class Mapper(ABC):
     """Base class for mappers"""
 
+    @property
+    def changed_columns(self) -> frozenset[str] | None:
+        """Columns the mapper may add, change or remove; None if unknown"""
+        return None
+
+    @property
+    def used_columns(self) -> frozenset[str] | None:
+        """Columns the mapper reads; None if unknown"""
+        return None
+
+    def keeps(self, column: str) -> bool:
+        """Whether the mapper leaves values of the column untouched
+        :param column: column name
+        """
+        return self.changed_columns is not None and column not in self.changed_columns
+
+    def output_columns(self, columns: TColumns) -> TColumns:
+        """Columns of result rows given columns of rows passed
+        :param columns: columns of rows passed
+        """
+        if columns is None or self.changed_columns is None:
+            return None
+        return columns | self.changed_columns
+
+    def required_columns(self, required: TColumns) -> TColumns:
+        """Columns of rows passed needed to produce required columns of result rows
+        :param required: needed columns of result rows
+        """
+        if required is None or self.used_columns is None or self.changed_columns is None:
+            return None
+        return (required - self.changed_columns) | self.used_columns
+
     @abstractmethod
     def __call__(self, row: TRow) -> TRowsGenerator:
         """
@@ -18,25 +54,206 @@ class Mapper(ABC):
         """
 
 
+class OneToOneMapper(Mapper):
+    """Base class for mappers yielding exactly one row per row passed"""
+
+    @abstractmethod
+    def transform(self, row: TRow) -> TRow:
+        """
+        :param row: one table row
+        """
+
+    def __call__(self, row: TRow) -> TRowsGenerator:
+        yield self.transform(row)
+
+
 class Map(Operation):
     def __init__(self, mapper: Mapper) -> None:
         self._mapper = mapper
 
+    @property
+    def mapper(self) -> Mapper:
+        return self._mapper
+
     def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         for i in rows:
             yield from self._mapper(i)
 
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        return _mapped_ordering(inputs[0], (self._mapper,))
+
+    def output_columns(self, *inputs: TColumns) -> TColumns:
+        return self._mapper.output_columns(inputs[0])
+
+    def required_columns(self, required: TColumns, *inputs: TColumns) -> tuple[TColumns, ...]:
+        return (self._mapper.required_columns(required),)
+
+
+_worker_mapper: Mapper | None = None
+
+
+def _init_worker(mapper: Mapper) -> None:
+    global _worker_mapper
+    _worker_mapper = mapper
+
+
+def _map_chunk(chunk: list[TRow]) -> list[TRow]:
+    assert _worker_mapper is not None
+    return [result for row in chunk for result in _worker_mapper(row)]
+
+
+class ParallelMap(Map):
+    """
+    Map in a pool of worker processes: rows are sent to workers in chunks.
+    Workers are forked, so the mapper itself (with closures it holds) is not pickled, only rows are.
+    At most 'max_in_flight' chunks are processed at a time, so memory consumption does not depend on input size.
+    """
+
+    def __init__(self, mapper: Mapper, workers: int, chunk_size: int = 1000, ordered: bool = True,
+                 max_in_flight: int | None = None) -> None:
+        """
+        :param mapper: mapper to use
+        :param workers: number of worker processes
+        :param chunk_size: number of rows sent to a worker at once
+        :param ordered: keep order of rows; otherwise chunks are yielded as soon as they are ready
+        :param max_in_flight: max number of chunks sent to workers but not yielded yet, twice 'workers' by default
+        """
+        super().__init__(mapper)
+        self._workers = workers
+        self._chunk_size = chunk_size
+        self._ordered = ordered
+        self._max_in_flight = 2 * workers if max_in_flight is None else max_in_flight
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        context = multiprocessing.get_context('fork')
+        with context.Pool(self._workers, initializer=_init_worker, initargs=(self._mapper,)) as pool:
+            if self._ordered:
+                yield from self._ordered_map(pool, rows)
+            else:
+                yield from self._unordered_map(pool, rows)
+
+    def _chunks(self, rows: TRowsIterable) -> tp.Iterator[list[TRow]]:
+        iterator = iter(rows)
+        while chunk := list(itertools.islice(iterator, self._chunk_size)):
+            yield chunk
+
+    def _ordered_map(self, pool: tp.Any, rows: TRowsIterable) -> TRowsGenerator:
+        pending: collections.deque[tp.Any] = collections.deque()
+        for chunk in self._chunks(rows):
+            pending.append(pool.apply_async(_map_chunk, (chunk,)))
+            if len(pending) >= self._max_in_flight:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+    def _unordered_map(self, pool: tp.Any, rows: TRowsIterable) -> TRowsGenerator:
+        results: queue.SimpleQueue[list[TRow] | BaseException] = queue.SimpleQueue()
+        in_flight = 0
+
+        def take() -> list[TRow]:
+            result = results.get()
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        for chunk in self._chunks(rows):
+            pool.apply_async(_map_chunk, (chunk,), callback=results.put, error_callback=results.put)
+            in_flight += 1
+            if in_flight >= self._max_in_flight:
+                in_flight -= 1
+                yield from take()
+        for _ in range(in_flight):
+            yield from take()
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        return super().ordering(*inputs) if self._ordered else tuple()
+
+
+class FusedMap(Operation):
+    """
+    Several consecutive maps applied in a single pass.
+    Mappers are driven by one loop instead of a chain of generators; one-to-one mappers
+    are applied with a plain call of 'transform', without creating a generator per row.
+    """
+
+    def __init__(self, mappers: tp.Sequence[Mapper]) -> None:
+        """
+        :param mappers: mappers to apply, in order
+        """
+        self._mappers = tuple(mappers)
+
+    @property
+    def mappers(self) -> tuple[Mapper, ...]:
+        return self._mappers
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        transforms: list[tp.Callable[[TRow], TRow]] = []
+        for mapper in self._mappers:
+            if isinstance(mapper, OneToOneMapper):
+                transforms.append(mapper.transform)
+            else:
+                rows = self._segment(rows, tuple(transforms), mapper)
+                transforms = []
+        if transforms:
+            rows = self._segment(rows, tuple(transforms), None)
+        yield from rows
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        return _mapped_ordering(inputs[0], self._mappers)
+
+    def output_columns(self, *inputs: TColumns) -> TColumns:
+        columns = inputs[0]
+        for mapper in self._mappers:
+            columns = mapper.output_columns(columns)
+        return columns
+
+    def required_columns(self, required: TColumns, *inputs: TColumns) -> tuple[TColumns, ...]:
+        for mapper in reversed(self._mappers):
+            required = mapper.required_columns(required)
+        return (required,)
+
+    @staticmethod
+    def _segment(rows: TRowsIterable, transforms: tuple[tp.Callable[[TRow], TRow], ...],
+                 mapper: Mapper | None) -> TRowsGenerator:
+        """Apply one-to-one transforms followed by an arbitrary mapper"""
+        if mapper is None:
+            for row in rows:
+                for transform in transforms:
+                    row = transform(row)
+                yield row
+        else:
+            for row in rows:
+                for transform in transforms:
+                    row = transform(row)
+                yield from mapper(row)
+
+
+def _mapped_ordering(ordering: TOrdering, mappers: tp.Sequence[Mapper]) -> TOrdering:
+    """Longest prefix of the ordering untouched by mappers"""
+    for i, (column, _) in enumerate(ordering):
+        if not all(mapper.keeps(column) for mapper in mappers):
+            return ordering[:i]
+    return ordering
+
 
 # Mappers
 
-class DummyMapper(Mapper):
+class DummyMapper(OneToOneMapper):
     """Yield exactly the row passed"""
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
-        yield row
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset()
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset()
+
+    def transform(self, row: TRow) -> TRow:
+        return row
 
 
-class FilterPunctuation(Mapper):
+class FilterPunctuation(OneToOneMapper):
     """Left only non-punctuation symbols"""
 
     def __init__(self, column: str):
@@ -45,12 +262,20 @@ class FilterPunctuation(Mapper):
         """
         self._column = column
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._column])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset([self._column])
+
+    def transform(self, row: TRow) -> TRow:
         row[self._column] = row[self._column].translate(str.maketrans('', '', string.punctuation))
-        yield row
+        return row
 
 
-class LowerCase(Mapper):
+class LowerCase(OneToOneMapper):
     """Replace column value with value in lower case"""
 
     def __init__(self, column: str):
@@ -59,9 +284,17 @@ class LowerCase(Mapper):
         """
         self._column = column
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._column])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset([self._column])
+
+    def transform(self, row: TRow) -> TRow:
         row[self._column] = row[self._column].lower()
-        yield row
+        return row
 
 
 class Split(Mapper):
@@ -75,6 +308,14 @@ class Split(Mapper):
         self._column = column
         self._separator = separator
 
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._column])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset([self._column])
+
     def __call__(self, row: TRow) -> TRowsGenerator:
         pattern = r'[^\s]+' if self._separator is None else fr'[^{self._separator}]*'
         check = True
@@ -90,7 +331,7 @@ class Split(Mapper):
             yield ans
 
 
-class Product(Mapper):
+class Product(OneToOneMapper):
     """Calculates product of multiple columns"""
 
     def __init__(self, columns: tp.Sequence[str], result_column: str = 'product') -> None:
@@ -101,15 +342,23 @@ class Product(Mapper):
         self._columns = columns
         self._result_column = result_column
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._result_column])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset(self._columns)
+
+    def transform(self, row: TRow) -> TRow:
         count = 1
         for word in self._columns:
             count *= row[word]
         row[self._result_column] = count
-        yield row
+        return row
 
 
-class Idf(Mapper):
+class Idf(OneToOneMapper):
     """Calculates Idf columns"""
 
     def __init__(self, columns: tp.Sequence[str], result_column: str = 'idf') -> None:
@@ -120,42 +369,87 @@ class Idf(Mapper):
         self._columns = columns
         self._result_column = result_column
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._result_column])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset(self._columns)
+
+    def transform(self, row: TRow) -> TRow:
         row[self._result_column] = math.log(row[self._columns[0]] / row[self._columns[1]])
-        yield row
+        return row
 
 
 class Filter(Mapper):
     """Remove records that don't satisfy some condition"""
 
-    def __init__(self, condition: tp.Callable[[TRow], bool]) -> None:
+    def __init__(self, condition: tp.Callable[[TRow], bool], columns: tp.Sequence[str] | None = None) -> None:
         """
         :param condition: if condition is not true - remove record
+        :param columns: columns the condition depends on, lets the graph apply the filter earlier; None if unknown
         """
         self._condition = condition
+        self._columns = None if columns is None else frozenset(columns)
+
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset()
+
+    @property
+    def used_columns(self) -> frozenset[str] | None:
+        return self._columns
+
+    def required_columns(self, required: TColumns) -> TColumns:
+        if required is None or self._columns is None:
+            return None
+        return required | self._columns
 
     def __call__(self, row: TRow) -> TRowsGenerator:
         if self._condition(row):
             yield row
 
 
-class Project(Mapper):
+class Project(OneToOneMapper):
     """Leave only mentioned columns"""
 
-    def __init__(self, columns: tp.Sequence[str]) -> None:
+    def __init__(self, columns: tp.Sequence[str], ignore_missing: bool = False) -> None:
         """
         :param columns: names of columns
+        :param ignore_missing: skip columns missing in a row instead of failing
         """
         self._columns = columns
+        self._ignore_missing = ignore_missing
+        self._column_set = frozenset(columns)
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return self._column_set
+
+    def keeps(self, column: str) -> bool:
+        return column in self._column_set
+
+    def output_columns(self, columns: TColumns) -> TColumns:
+        if self._ignore_missing and columns is not None:
+            return self._column_set & columns
+        return self._column_set
+
+    def required_columns(self, required: TColumns) -> TColumns:
+        if self._ignore_missing and required is not None:
+            return self._column_set & required
+        return self._column_set
+
+    def transform(self, row: TRow) -> TRow:
+        if self._ignore_missing:
+            return {key: value for key, value in row.items() if key in self._column_set}
         ans = {}
         for key in self._columns:
             ans[key] = row[key]
-        yield ans
+        return ans
 
 
-class Haversine(Mapper):
+class Haversine(OneToOneMapper):
     """haversine formula"""
 
     EARTH_RADIUS_KM = 6373
@@ -170,7 +464,15 @@ class Haversine(Mapper):
         self._start = start
         self._end = end
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._name])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset([self._start, self._end])
+
+    def transform(self, row: TRow) -> TRow:
         lat1 = row[self._start][1] / 180 * math.pi
         lon1 = row[self._start][0] / 180 * math.pi
         lat2 = row[self._end][1] / 180 * math.pi
@@ -179,10 +481,10 @@ class Haversine(Mapper):
         leng = math.acos(math.sin(lat1) * math.sin(lat2) + math.cos(lat1) * math.cos(lat2) * math.cos(
             lon1 - lon2)) * Haversine.EARTH_RADIUS_KM
         row[self._name] = leng
-        yield row
+        return row
 
 
-class ParseTime(Mapper):
+class ParseTime(OneToOneMapper):
     """parse_time to weekday and hour """
 
     def __init__(self, time: str, weekday: str, hour: str) -> None:
@@ -195,14 +497,22 @@ class ParseTime(Mapper):
         self._weekday = weekday
         self._hour = hour
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._weekday, self._hour])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset([self._time])
+
+    def transform(self, row: TRow) -> TRow:
         date = parse_datetime(row[self._time])
         row[self._weekday] = list(calendar.day_abbr)[date.weekday()]
         row[self._hour] = date.hour
-        yield row
+        return row
 
 
-class TimeDiff(Mapper):
+class TimeDiff(OneToOneMapper):
     """get difference between 2 date """
 
     def __init__(self, name: str, first_time: str, second_time: str) -> None:
@@ -215,8 +525,16 @@ class TimeDiff(Mapper):
         self._first_time = first_time
         self._second_time = second_time
 
-    def __call__(self, row: TRow) -> TRowsGenerator:
+    @property
+    def changed_columns(self) -> frozenset[str]:
+        return frozenset([self._name])
+
+    @property
+    def used_columns(self) -> frozenset[str]:
+        return frozenset([self._first_time, self._second_time])
+
+    def transform(self, row: TRow) -> TRow:
         date1 = parse_datetime(row[self._first_time])
         date2 = parse_datetime(row[self._second_time])
         row[self._name] = abs((date2 - date1).total_seconds()) / 3600
-        yield row
+        return row
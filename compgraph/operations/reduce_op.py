@@ -1,15 +1,35 @@
+import functools
 import heapq
 import itertools
+import multiprocessing
+import os
+import pickle
+import tempfile
 from abc import ABC, abstractmethod
 import typing as tp
 from collections import defaultdict
 
-from . import Operation, TRow, TRowsGenerator, TRowsIterable
+from . import Operation, TColumns, TOrdering, TRow, TRowsGenerator, TRowsIterable
+from .utils import dump_rows, load_rows, sort_rows
 
 
 class Reducer(ABC):
     """Base class for reducers"""
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        """Columns of result rows given columns of rows passed; None if unknown
+        :param group_key: grouping keys
+        :param columns: columns of rows passed
+        """
+        return None
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        """Columns of rows passed needed to produce required columns of result rows; None if all
+        :param group_key: grouping keys
+        :param required: needed columns of result rows
+        """
+        return None
+
     @abstractmethod
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         """
@@ -22,16 +42,128 @@ class Reduce(Operation):
         self._reducer = reducer
         self._keys = keys
 
+    @property
+    def reducer(self) -> Reducer:
+        return self._reducer
+
+    @property
+    def keys(self) -> tp.Sequence[str]:
+        return self._keys
+
     def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         for key, group in itertools.groupby(rows, lambda x: [x[k] for k in self._keys]):
             yield from self._reducer(tuple(self._keys), group)
 
+    def output_columns(self, *inputs: TColumns) -> TColumns:
+        return self._reducer.output_columns(tuple(self._keys), inputs[0])
+
+    def required_columns(self, required: TColumns, *inputs: TColumns) -> tuple[TColumns, ...]:
+        return (self._reducer.required_columns(tuple(self._keys), required),)
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        for i, (column, _) in enumerate(inputs[0]):
+            if column not in self._keys:
+                return inputs[0][:i]
+        return inputs[0]
+
+
+_worker_reducer: tuple[Reducer, tuple[str, ...]] | None = None
+
+
+def _init_worker(reducer: Reducer, keys: tuple[str, ...]) -> None:
+    global _worker_reducer
+    _worker_reducer = reducer, keys
+
+
+def _reduce_partition(filename: str, chunk_size: int) -> str:
+    """Sort and reduce rows of one partition, return name of file with the result"""
+    assert _worker_reducer is not None
+    reducer, keys = _worker_reducer
+    directory = os.path.dirname(filename)
+    rows = sort_rows(load_rows(filename), lambda x: [x[k] for k in keys], chunk_size, directory)
+    result = filename + '.out'
+    with open(result, 'wb') as file:
+        dump_rows(Reduce(reducer, keys)(rows), file)
+    os.remove(filename)
+    return result
+
+
+class ShuffleReduce(Reduce):
+    """
+    Reduce which does not require sorted input, MapReduce style.
+    Rows are hash-partitioned by keys into files, every partition is sorted (in chunks of at most 'chunk_size'
+    rows, see 'sort_rows') and reduced in a separate worker process, results are concatenated or merged by keys.
+    """
+
+    CHUNK_SIZE = 100000
+
+    def __init__(self, reducer: Reducer, keys: tp.Sequence[str], partitions: int, merge: bool = True,
+                 chunk_size: int | None = None) -> None:
+        """
+        :param reducer: reducer to use
+        :param keys: keys for grouping
+        :param partitions: number of partitions (and of worker processes)
+        :param merge: merge results of partitions so they are sorted by keys, otherwise just concatenate them
+        :param chunk_size: max number of rows a worker sorts in memory at once
+        """
+        super().__init__(reducer, keys)
+        self._partitions = partitions
+        self._merge = merge
+        self._chunk_size = ShuffleReduce.CHUNK_SIZE if chunk_size is None else chunk_size
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        keys = tuple(self._keys)
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = self._partition(rows, directory)
+            if not filenames:
+                return
+            context = multiprocessing.get_context('fork')
+            with context.Pool(len(filenames), initializer=_init_worker, initargs=(self._reducer, keys)) as pool:
+                results = pool.imap(functools.partial(_reduce_partition, chunk_size=self._chunk_size), filenames)
+                if self._merge:
+                    yield from heapq.merge(*(load_rows(result) for result in list(results)),
+                                           key=lambda x: [x[k] for k in keys])
+                else:
+                    for result in results:
+                        yield from load_rows(result)
+
+    def _partition(self, rows: TRowsIterable, directory: str) -> list[str]:
+        """Split rows into partition files by hash of keys, return names of non-empty ones"""
+        filenames = [os.path.join(directory, str(i)) for i in range(self._partitions)]
+        files = [open(filename, 'wb') for filename in filenames]
+        counts = [0] * self._partitions
+        try:
+            for row in rows:
+                partition = self._hash(row) % self._partitions
+                dump_rows((row,), files[partition])
+                counts[partition] += 1
+        finally:
+            for file in files:
+                file.close()
+        return [filename for filename, count in zip(filenames, counts) if count > 0]
+
+    def _hash(self, row: TRow) -> int:
+        key = tuple(row[k] for k in self._keys)
+        try:
+            return hash(key)
+        except TypeError:  # unhashable values, e.g. lists of coordinates
+            return hash(pickle.dumps(key, pickle.HIGHEST_PROTOCOL))
+
+    def ordering(self, *inputs: TOrdering) -> TOrdering:
+        return tuple((key, False) for key in self._keys) if self._merge else tuple()
+
 
 # Reducers
 
 class FirstReducer(Reducer):
     """Yield only first row from passed ones"""
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        return columns
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        return None if required is None else required | frozenset(group_key)
+
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         for row in rows:
             yield row
@@ -49,6 +181,12 @@ class TopN(Reducer):
         self._column_max = column
         self._n = n
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        return columns
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        return None if required is None else required | frozenset(group_key) | {self._column_max}
+
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         ans: list[tp.Any] = []
         count = 0
@@ -72,6 +210,12 @@ class TermFrequency(Reducer):
         self._words_column = words_column
         self._result_column = result_column
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._words_column, self._result_column}
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._words_column}
+
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         add_word: defaultdict[str, int] = defaultdict(int)
         count = 0
@@ -108,6 +252,12 @@ class Count(Reducer):
         """
         self._column = column
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._column}
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        return frozenset(group_key)
+
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         count = 0
         last_row: dict[str, tp.Any] = dict()
@@ -136,6 +286,12 @@ class Sum(Reducer):
         """
         self._column = column
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._column}
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._column}
+
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         count = 0
         last_row: dict[str, tp.Any] = dict()
@@ -165,6 +321,12 @@ class MeanSpeed(Reducer):
         self._distance = distance
         self._time = time
 
+    def output_columns(self, group_key: tuple[str, ...], columns: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._name}
+
+    def required_columns(self, group_key: tuple[str, ...], required: TColumns) -> TColumns:
+        return frozenset(group_key) | {self._distance, self._time}
+
     def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
         ans: TRow = {}
         sum_time = 0
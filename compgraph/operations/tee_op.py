@@ -0,0 +1,119 @@
+import bisect
+import pickle
+import tempfile
+import typing as tp
+
+from . import TRow, TRowsGenerator, TRowsIterable
+
+
+class Tee:
+    """
+    Splits one stream of rows between several consumers, so a shared subgraph is computed only once.
+    Rows not yet seen by every consumer are buffered in memory; when the buffer outgrows `buffer_size`
+    it is spilled to a temporary file, so consumers progressing at different speeds don't
+    materialize the whole stream in RAM.
+    Every consumer gets its own copy of a row, so mappers changing rows in place don't interfere.
+    """
+
+    BUFFER_SIZE = 10000
+
+    def __init__(self, rows: TRowsIterable, consumers: int, buffer_size: int | None = None) -> None:
+        """
+        :param rows: rows to share
+        :param consumers: number of consumers
+        :param buffer_size: max number of rows kept in memory
+        """
+        self._rows = iter(rows)
+        self._buffer_size = Tee.BUFFER_SIZE if buffer_size is None else buffer_size
+        self._positions = [0] * consumers
+        self._finished = [False] * consumers
+        self._next_consumer = 0
+        self._exhausted = False
+        self._produced = 0
+        self._buffer: list[TRow] = []
+        self._buffer_start = 0
+        self._spill: tp.IO[bytes] | None = None
+        self._segments: list[int] = []  # index of the first row of every spilled segment
+        self._offsets: list[int] = []  # file offset of every spilled segment
+
+    def consumer(self) -> TRowsGenerator:
+        """Construct generator for the next consumer"""
+        index = self._next_consumer
+        self._next_consumer += 1
+        return self._consume(index)
+
+    def _consume(self, index: int) -> TRowsGenerator:
+        offset: int | None = None
+        try:
+            while True:
+                position = self._positions[index]
+                if position < self._buffer_start:
+                    if offset is None:
+                        offset = self._seek(position)
+                    row, offset = self._read(offset)
+                elif position - self._buffer_start < len(self._buffer):
+                    offset = None
+                    row = self._buffer[position - self._buffer_start]
+                elif self._pull():
+                    continue
+                else:
+                    break
+                self._positions[index] = position + 1
+                yield row.copy()
+        finally:
+            self._finish(index)
+
+    def _pull(self) -> bool:
+        if self._exhausted:
+            return False
+        try:
+            row = next(self._rows)
+        except StopIteration:
+            self._exhausted = True
+            return False
+        if len(self._buffer) >= self._buffer_size:
+            self._shrink()
+        self._buffer.append(row)
+        self._produced += 1
+        return True
+
+    def _shrink(self) -> None:
+        """Drop rows seen by every consumer and spill the rest if the buffer is still too big"""
+        lowest = min(position for position, finished in zip(self._positions, self._finished) if not finished)
+        seen = min(lowest, self._produced) - self._buffer_start
+        if seen > 0:
+            del self._buffer[:seen]
+            self._buffer_start += seen
+        if len(self._buffer) < self._buffer_size:
+            return
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile()
+        self._spill.seek(0, 2)
+        self._segments.append(self._buffer_start)
+        self._offsets.append(self._spill.tell())
+        for row in self._buffer:
+            pickle.dump(row, self._spill, pickle.HIGHEST_PROTOCOL)
+        self._buffer_start += len(self._buffer)
+        self._buffer = []
+
+    def _seek(self, position: int) -> int:
+        assert self._spill is not None
+        segment = bisect.bisect_right(self._segments, position) - 1
+        offset = self._offsets[segment]
+        for _ in range(position - self._segments[segment]):
+            _, offset = self._read(offset)
+        return offset
+
+    def _read(self, offset: int) -> tuple[TRow, int]:
+        assert self._spill is not None
+        self._spill.seek(offset)
+        row = pickle.load(self._spill)
+        return row, self._spill.tell()
+
+    def _finish(self, index: int) -> None:
+        self._finished[index] = True
+        if all(self._finished):
+            self._buffer = []
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
@@ -1,8 +1,61 @@
+import heapq
+import itertools
+import os
+import pickle
+import tempfile
+import typing as tp
 from datetime import datetime
 
+from .base import TRow, TRowsGenerator, TRowsIterable
+
 
 def parse_datetime(date: str) -> datetime:
     try:
         return datetime.strptime(date, '%Y%m%dT%H%M%S.%f')
     except ValueError:
         return datetime.strptime(date, '%Y%m%dT%H%M%S')
+
+
+def dump_rows(rows: TRowsIterable, file: tp.IO[bytes]) -> int:
+    """Write rows to binary file, return number of rows written"""
+    count = 0
+    for row in rows:
+        pickle.dump(row, file, pickle.HIGHEST_PROTOCOL)
+        count += 1
+    return count
+
+
+def load_rows(filename: str) -> TRowsGenerator:
+    """Read rows written by 'dump_rows' from file"""
+    with open(filename, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                break
+
+
+def sort_rows(rows: TRowsIterable, key: tp.Callable[[TRow], tp.Any], chunk_size: int,
+              directory: str | None = None) -> TRowsGenerator:
+    """Stable sort which keeps at most 'chunk_size' rows in memory: sorted chunks of rows are written
+    to temporary files and merged
+    :param rows: rows to sort
+    :param key: sorting key
+    :param chunk_size: max number of rows sorted in memory at once
+    :param directory: directory for temporary files, default one if None
+    """
+    iterator = iter(rows)
+    chunk = list(itertools.islice(iterator, chunk_size))
+    chunk.sort(key=key)
+    if len(chunk) < chunk_size:
+        yield from chunk
+        return
+    with tempfile.TemporaryDirectory(dir=directory) as runs_directory:
+        runs: list[str] = []
+        while chunk:
+            runs.append(os.path.join(runs_directory, str(len(runs))))
+            with open(runs[-1], 'wb') as file:
+                dump_rows(chunk, file)
+            chunk = list(itertools.islice(iterator, chunk_size))
+            chunk.sort(key=key)
+        yield from heapq.merge(*(load_rows(run) for run in runs), key=key)
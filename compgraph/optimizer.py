@@ -0,0 +1,179 @@
+import collections
+import typing as tp
+
+from . import operations as ops
+from .plan import Node
+
+TConsumers = collections.Counter[tp.Hashable]
+TRule = tp.Callable[[Node, TConsumers], Node]
+
+
+def optimize(root: Node) -> Node:
+    """Rewrite execution plan into an equivalent but cheaper one
+    :param root: last node of the plan
+    """
+    root = share_sorts(root)
+    root = eliminate_sorts(root)
+    root = push_filters(root)
+    root = push_projections(root)
+    root = rewrite(root, fuse_maps)
+    return root
+
+
+def count_consumers(root: Node) -> TConsumers:
+    """Count consumers of every node reachable from root (root itself is consumed by the caller)"""
+    consumers: TConsumers = collections.Counter([root.key])
+    for node in root.walk():
+        consumers.update(parent.key for parent in node.parents)
+    return consumers
+
+
+def rewrite(root: Node, rule: TRule) -> Node:
+    """Apply rule to every node of the plan, parents first.
+    Rule gets a node (with already rewritten parents) and consumers of the rewritten nodes;
+    it returns the node itself or an equivalent replacement
+    :param root: last node of the plan
+    :param rule: rewriting rule
+    """
+    consumers = count_consumers(root)
+    rewritten: dict[tp.Hashable, Node] = dict()
+    for node in root.walk():
+        parents = tuple(rewritten[parent.key] for parent in node.parents)
+        candidate = node if parents == node.parents else Node(node.op, parents)
+        consumers[candidate.key] = consumers[node.key]
+        new_node = rule(candidate, consumers)
+        if new_node is not candidate:
+            if new_node.key in consumers:
+                # replaced by one of existing nodes: it gets consumers of the candidate
+                consumers[new_node.key] += consumers[candidate.key] - (new_node in candidate.parents)
+            else:
+                consumers[new_node.key] = consumers[candidate.key]
+        rewritten[node.key] = new_node
+    return rewritten[root.key]
+
+
+def output_columns(node: Node, known: dict[tp.Hashable, ops.TColumns]) -> ops.TColumns:
+    """Columns of rows produced by the node; results are cached in 'known'"""
+    for subnode in node.walk():
+        if subnode.key not in known:
+            known[subnode.key] = subnode.op.output_columns(*(known[parent.key] for parent in subnode.parents))
+    return known[node.key]
+
+
+def _mappers(op: ops.Operation) -> tuple[ops.Mapper, ...] | None:
+    if type(op) is ops.Map:
+        return (op.mapper,)
+    if isinstance(op, ops.FusedMap):
+        return op.mappers
+    return None
+
+
+def fuse_maps(node: Node, consumers: TConsumers) -> Node:
+    """Collapse consecutive maps into a single ops.FusedMap (parallel maps are left as they are)"""
+    mappers = _mappers(node.op)
+    if mappers is None:
+        return node
+    parent = node.parents[0]
+    parent_mappers = _mappers(parent.op)
+    if parent_mappers is None or consumers[parent.key] > 1:
+        return node
+    return Node(ops.FusedMap(parent_mappers + mappers), parent.parents)
+
+
+def share_sorts(root: Node) -> Node:
+    """Merge sibling sorts of the same node by the same keys into a single shared sort.
+    Sorts by different keys are never shared, even if one key list extends the other: sorting is stable,
+    so e.g. sort by [doc] keeps the input order of rows with equal doc, while sort by [doc, text] does not
+    """
+    shared: dict[tuple[tp.Hashable, ops.TOrdering], Node] = dict()
+
+    def rule(node: Node, consumers: TConsumers) -> Node:
+        if not isinstance(node.op, ops.ExternalSort) or node.op.group_keys:
+            return node
+        key = (node.parents[0].key, node.op.ordering(tuple()))
+        return shared.setdefault(key, node)
+
+    return rewrite(root, rule)
+
+
+def eliminate_sorts(root: Node) -> Node:
+    """Remove sorts of rows which are already sorted as required"""
+    known: dict[tp.Hashable, ops.TOrdering] = dict()
+
+    def rule(node: Node, consumers: TConsumers) -> Node:
+        inputs = tuple(known[parent.key] for parent in node.parents)
+        if isinstance(node.op, ops.ExternalSort) and node.op.is_redundant(inputs[0]):
+            return node.parents[0]
+        known[node.key] = node.op.ordering(*inputs)
+        return node
+
+    return rewrite(root, rule)
+
+
+def _is_filter(op: ops.Operation) -> bool:
+    return isinstance(op, ops.Map) and isinstance(op.mapper, ops.Filter)
+
+
+def push_filters(root: Node) -> Node:
+    """Apply filters as early as possible: before sorts, before reduces if the condition depends only
+    on grouping keys and before joins if the condition depends only on one input (and the join strategy allows it).
+    Filters are never swapped with each other, as a filter may guard conditions of the following ones
+    """
+    known: dict[tp.Hashable, ops.TColumns] = dict()
+
+    def push(op: ops.Map, node: Node, consumers: TConsumers) -> Node:
+        columns = op.mapper.used_columns
+        if consumers[node.key] <= 1:
+            if isinstance(node.op, ops.ExternalSort):
+                return Node(node.op, (push(op, node.parents[0], consumers),))
+            if isinstance(node.op, ops.Reduce) and columns is not None and columns <= frozenset(node.op.keys):
+                return Node(node.op, (push(op, node.parents[0], consumers),))
+            if isinstance(node.op, ops.Join) and columns is not None:
+                inputs = node.op.filtered_inputs(columns, *(output_columns(parent, known)
+                                                            for parent in node.parents))
+                if any(inputs):
+                    return Node(node.op, tuple(push(op, parent, consumers) if filtered else parent
+                                               for parent, filtered in zip(node.parents, inputs)))
+        return Node(op, (node,))
+
+    def rule(node: Node, consumers: TConsumers) -> Node:
+        if isinstance(node.op, ops.Map) and _is_filter(node.op):
+            return push(node.op, node.parents[0], consumers)
+        return node
+
+    return rewrite(root, rule)
+
+
+def push_projections(root: Node) -> Node:
+    """Drop columns nobody needs before sorts and joins, so fewer data are sent to sorting processes
+    and copied by joiners
+    """
+    known: dict[tp.Hashable, ops.TColumns] = dict()
+    needed: dict[tp.Hashable, ops.TColumns] = {root.key: None}
+    inputs_needed: dict[ops.Operation, tuple[ops.TColumns, ...]] = dict()
+    for node in reversed(list(root.walk())):
+        parents_columns = (output_columns(parent, known) for parent in node.parents)
+        inputs = node.op.required_columns(needed[node.key], *parents_columns)
+        inputs_needed[node.op] = inputs
+        for parent, columns in zip(node.parents, inputs):
+            if parent.key not in needed:
+                needed[parent.key] = columns
+            else:
+                previous = needed[parent.key]
+                needed[parent.key] = None if previous is None or columns is None else previous | columns
+
+    def project(node: Node, columns: ops.TColumns) -> Node:
+        if columns is None:
+            return node
+        existing = output_columns(node, known)
+        if existing is not None and existing <= columns:
+            return node
+        return Node(ops.Map(ops.Project(sorted(columns), ignore_missing=True)), (node,))
+
+    def rule(node: Node, consumers: TConsumers) -> Node:
+        if not isinstance(node.op, (ops.ExternalSort, ops.Join)):
+            return node
+        parents = tuple(project(parent, columns) for parent, columns in zip(node.parents, inputs_needed[node.op]))
+        return node if parents == node.parents else Node(node.op, parents)
+
+    return rewrite(root, rule)
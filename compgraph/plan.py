@@ -0,0 +1,35 @@
+import dataclasses
+import typing as tp
+
+from . import operations as ops
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class Node:
+    """
+    Immutable node of execution plan: operation applied to the outputs of parent nodes.
+    Nodes only reference their parents, so extending a plan is O(1) and plans built from a common
+    prefix share its nodes (and the mappers, reducers and joiners inside them).
+    """
+    op: ops.Operation
+    parents: tuple['Node', ...] = tuple()
+
+    @property
+    def key(self) -> tp.Hashable:
+        """Nodes with equal keys produce equal rows: the node itself or, for data sources, the source operation"""
+        return self if self.parents else self.op
+
+    def walk(self) -> tp.Iterator['Node']:
+        """Iterate over all nodes reachable from this one (including itself), parents first"""
+        seen: set[tp.Hashable] = set()
+        stack: list[tuple[Node, bool]] = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node.key in seen:
+                continue
+            if expanded:
+                seen.add(node.key)
+                yield node
+                continue
+            stack.append((node, True))
+            stack.extend((parent, False) for parent in reversed(node.parents))
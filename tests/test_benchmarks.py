@@ -0,0 +1,41 @@
+import os
+import timeit
+import typing as tp
+
+import pytest
+
+from compgraph import operations as ops
+
+# Wall-clock benchmarks are opt-in: run with BENCHMARKS=1, timings are recorded as junitxml properties
+pytestmark = pytest.mark.skipif(not int(os.environ.get('BENCHMARKS', '0')), reason='set BENCHMARKS=1 to run')
+
+ROWS = 20000
+
+TRecord = tp.Callable[[str, tp.Any], None]
+
+
+def _best_time(callback: tp.Callable[[], tp.Any], repeat: int = 5) -> float:
+    return min(timeit.repeat(callback, number=1, repeat=repeat))
+
+
+def _report(record_property: TRecord, name: str, before: float, after: float, rows: int) -> None:
+    record_property(f'{name} before, us/row', round(before / rows * 1e6, 3))
+    record_property(f'{name} after, us/row', round(after / rows * 1e6, 3))
+
+
+def test_map_fusion_word_count(record_property: TRecord) -> None:
+    data = [{'doc_id': i, 'text': 'a'} for i in range(ROWS)]
+    mappers = [ops.FilterPunctuation('text'), ops.LowerCase('text'), ops.Split('text')]
+
+    def chained() -> None:
+        rows: tp.Iterable[ops.TRow] = iter(data)
+        for mapper in mappers:
+            rows = ops.Map(mapper)(rows)
+        for _ in rows:
+            pass
+
+    def fused() -> None:
+        for _ in ops.FusedMap(mappers)(iter(data)):
+            pass
+
+    _report(record_property, 'word count maps', _best_time(chained), _best_time(fused), ROWS)
@@ -1,4 +1,10 @@
+import typing as tp
+
+from compgraph import Graph
 from compgraph import algorithms as alg
+from compgraph import operations as ops
+from compgraph.optimizer import optimize
+from compgraph.plan import Node
 from pytest import approx
 
 
@@ -81,3 +87,200 @@ def test_sequent_calls2() -> None:
 
     result2 = graph.run(texts=lambda: iter(rows2))
     assert list(result2) == expected2
+
+
+def test_shared_subgraph_runs_once() -> None:
+    rows = [
+        {'doc_id': 1, 'text': 'hello, little world'},
+        {'doc_id': 2, 'text': 'little'},
+        {'doc_id': 3, 'text': 'little little little'},
+        {'doc_id': 4, 'text': 'little? hello little world'},
+        {'doc_id': 5, 'text': 'HELLO HELLO! WORLD...'},
+        {'doc_id': 6, 'text': 'world? world... world!!! WORLD!!! HELLO!!!'}
+    ]
+    calls = 0
+
+    def source() -> tp.Iterator[dict[str, tp.Any]]:
+        nonlocal calls
+        calls += 1
+        return iter(rows)
+
+    graph = alg.inverted_index_graph('texts')
+    result = list(graph.run(texts=source))
+
+    assert calls == 1
+    assert len(result) == 9
+    assert rows[0] == {'doc_id': 1, 'text': 'hello, little world'}
+
+
+def test_shared_subgraph_consumers() -> None:
+    rows = [{'key': i % 7, 'value': i} for i in range(100)]
+
+    base = Graph.graph_from_iter('rows').map(ops.DummyMapper())
+    total = base.reduce(ops.Count('count'), [])
+    graph = base.sort(['key']).join(ops.InnerJoiner(), total, [])
+
+    result = list(graph.run(rows=lambda: iter(rows)))
+
+    assert len(result) == 100
+    assert all(row['count'] == 100 for row in result)
+    assert [row['key'] for row in result] == sorted(row['key'] for row in rows)
+
+
+def test_graph_building_shares_nodes() -> None:
+    lookup = {i: str(i) for i in range(10000)}
+    mapper = ops.Filter(lambda row: row['key'] in lookup)
+
+    base = Graph.graph_from_iter('rows')
+    graph = base
+    for _ in range(300):
+        graph = graph.map(mapper)
+    joined = graph.join(ops.InnerJoiner(), base, ['key'])
+
+    node = graph._node
+    for _ in range(300):
+        assert node.op._mapper is mapper  # type: ignore[attr-defined]
+        node = node.parents[0]
+    assert node is base._node
+    assert joined._node.parents == (graph._node, base._node)
+
+    rows = [{'key': i} for i in range(5)]
+    assert list(graph.run(rows=lambda: iter(rows))) == rows
+
+
+def test_optimizer_fuses_maps() -> None:
+    graph = alg.word_count_graph('docs')
+    plan = optimize(graph._node)
+
+    fused = [node.op for node in plan.walk() if isinstance(node.op, (ops.Map, ops.FusedMap))]
+    assert len(fused) == 1
+    assert isinstance(fused[0], ops.FusedMap)
+    assert [type(mapper) for mapper in fused[0].mappers][:3] == [ops.FilterPunctuation, ops.LowerCase, ops.Split]
+
+
+def test_optimizer_keeps_shared_maps() -> None:
+    base = Graph.graph_from_iter('rows').map(ops.DummyMapper())
+    graph = base.map(ops.DummyMapper()).join(ops.InnerJoiner(), base.map(ops.DummyMapper()), ['key'])
+    plan = optimize(graph._node)
+
+    assert all(type(node.op) is ops.Map for node in plan.walk() if node.parents and node is not plan)
+
+
+def _sorts(graph: Graph) -> list[tp.Sequence[str]]:
+    return [node.op.keys for node in optimize(graph._node).walk() if isinstance(node.op, ops.ExternalSort)]
+
+
+def test_optimizer_eliminates_sorts() -> None:
+    graph = alg.pmi_graph('texts')
+    assert len(_sorts(graph)) == 6
+
+    graph = alg.inverted_index_graph('texts')
+    assert sorted(map(list, _sorts(graph))) == [['doc_id'], ['doc_id', 'text'], ['doc_id', 'text'], ['text'],
+                                                ['text'], ['text', 'tf_idf']]
+
+
+def test_optimizer_keeps_sibling_sort_order() -> None:
+    rows = [{'a': 1, 'b': 9, 'i': 0}, {'a': 1, 'b': 1, 'i': 1}]
+    base = Graph.graph_from_iter('rows')
+    first = base.sort(['a']).reduce(ops.FirstReducer(), ['a'])
+    assert list(first.run(rows=lambda: iter(rows))) == [{'a': 1, 'b': 9, 'i': 0}]
+
+    graph = first.join(ops.InnerJoiner(), base.sort(['a', 'b']), ['a'])
+    assert [row['i_1'] for row in graph.run(rows=lambda: iter(rows))] == [0, 0]
+
+
+def test_source_order() -> None:
+    rows = [{'key': 1, 'value': 3}, {'key': 1, 'value': 2}, {'key': 2, 'value': 1}]
+
+    graph = Graph.graph_from_iter('rows', sorted_by=['key']).sort(['key']).reduce(ops.Sum('value'), ['key'])
+    assert _sorts(graph) == []
+    assert list(graph.run(rows=lambda: iter(rows))) == [{'key': 1, 'value': 5}, {'key': 2, 'value': 1}]
+
+    graph = Graph.graph_from_iter('rows', sorted_by=['key']).map(ops.LowerCase('key')).sort(['key'])
+    assert _sorts(graph) == [['key']]
+
+    graph = Graph.graph_from_iter('rows', sorted_by=['key'], reverse=True).sort(['key'])
+    assert _sorts(graph) == [['key']]
+
+
+def _parents_of(graph: Graph, op_type: type) -> list[Node]:
+    return [parent for node in optimize(graph._node).walk() if isinstance(node.op, op_type) for parent in node.parents]
+
+
+def _is_filter(node: Node) -> bool:
+    mappers = node.op.mappers if isinstance(node.op, ops.FusedMap) else [getattr(node.op, 'mapper', None)]
+    return any(isinstance(mapper, ops.Filter) for mapper in mappers)
+
+
+def test_filter_pushdown() -> None:
+    rows = [{'key': i % 5, 'value': i} for i in range(20)]
+
+    graph = Graph.graph_from_iter('rows').sort(['value']).map(ops.Filter(lambda row: row['key'] == 1))
+    assert [_is_filter(parent) for parent in _parents_of(graph, ops.ExternalSort)] == [True]
+    assert list(graph.run(rows=lambda: iter(rows))) == [row for row in rows if row['key'] == 1]
+
+    left = Graph.graph_from_iter('rows').map(ops.Project(['key', 'value']))
+    right = Graph.graph_from_iter('names').map(ops.Project(['key', 'name']))
+    for joiner, expected in [(ops.InnerJoiner(), [True, True]), (ops.LeftJoiner(), [True, False]),
+                             (ops.RightJoiner(), [False, True]), (ops.OuterJoiner(), [False, False])]:
+        graph = (left.join(joiner, right, ['key'])
+                 .map(ops.Filter(lambda row: row['value'] < 10, ['value']))
+                 .map(ops.Filter(lambda row: row['name'] != 'b', ['name'])))
+        assert [_is_filter(parent) for parent in _parents_of(graph, ops.Join)] == expected
+
+    graph = left.join(ops.OuterJoiner(), right, ['key']).map(ops.Filter(lambda row: row['key'] > 2, ['key']))
+    assert [_is_filter(parent) for parent in _parents_of(graph, ops.Join)] == [True, True]
+    names = [{'key': 1, 'name': 'a'}, {'key': 4, 'name': 'b'}, {'key': 7, 'name': 'c'}]
+    result = graph.run(rows=lambda: iter(sorted(rows, key=lambda row: row['key'])), names=lambda: iter(names))
+    assert [row['key'] for row in result] == [3] * 4 + [4] * 4 + [7]
+
+
+def test_filter_pushdown_keeps_filter_order() -> None:
+    rows = [{'x': 1, 'y': 2}, {'y': 1}, {'x': 3, 'y': 0}]
+    graph = (Graph.graph_from_iter('rows')
+             .sort(['y'])
+             .map(ops.Filter(lambda row: 'x' in row))
+             .map(ops.Filter(lambda row: row['x'] > 2)))
+    assert list(graph.run(rows=lambda: iter(rows))) == [{'x': 3, 'y': 0}]
+
+
+def test_projection_pushdown() -> None:
+    graph = alg.yandex_maps_graph('time', 'length')
+    projections = [parent.op.mapper for parent in _parents_of(graph, ops.ExternalSort)
+                   if isinstance(parent.op, ops.Map) and isinstance(parent.op.mapper, ops.Project)]
+    assert [mapper.used_columns for mapper in projections] == [frozenset(['weekday', 'hour', 'len', 'time_diff'])]
+
+    rows = [{'doc_id': 1, 'text': 'a b', 'payload': 'x' * 100}]
+    graph = (Graph.graph_from_iter('rows')
+             .map(ops.Split('text'))
+             .sort(['text'])
+             .reduce(ops.Count('count'), ['text']))
+    sort_inputs = [parent.op.output_columns(None) for parent in _parents_of(graph, ops.ExternalSort)]
+    assert sort_inputs == [frozenset(['text'])]
+    assert list(graph.run(rows=lambda: iter(rows))) == [{'text': 'a', 'count': 1}, {'text': 'b', 'count': 1}]
+
+
+def test_parallel_map_graph() -> None:
+    rows = [{'doc_id': i, 'text': 'Hello, World! ' * (i % 3 + 1)} for i in range(300)]
+
+    graph = (Graph.graph_from_iter('docs')
+             .map(ops.FilterPunctuation('text'), workers=2, chunk_size=16)
+             .map(ops.LowerCase('text'), workers=2, chunk_size=16, ordered=False)
+             .map(ops.Split('text'))
+             .sort(['text'])
+             .reduce(ops.Count('count'), ['text']))
+
+    expected = [{'text': 'hello', 'count': 600}, {'text': 'world', 'count': 600}]
+    assert list(graph.run(docs=lambda: iter(rows))) == expected
+
+
+def test_shuffle_reduce_graph() -> None:
+    docs = [{'doc_id': i, 'text': 'hello little world ' * (i % 4)} for i in range(100)]
+
+    graph = (Graph.graph_from_iter('docs')
+             .map(ops.Split('text'))
+             .reduce(ops.Count('count'), ['text'], partitions=3))
+
+    assert list(graph.run(docs=lambda: iter(docs))) == [
+        {'text': '', 'count': 25}, {'text': 'hello', 'count': 150},
+        {'text': 'little', 'count': 150}, {'text': 'world', 'count': 150}]
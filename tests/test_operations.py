@@ -1,6 +1,7 @@
 import copy
 import dataclasses
 import typing as tp
+from operator import itemgetter
 
 import pytest
 from pytest import approx
@@ -233,3 +234,127 @@ def test_join() -> None:
     result = ops.Join(ops.OuterJoiner(suffix_a='_1', suffix_b='_2'), ['player'])(iter(data_left), iter(data_right))
     assert isinstance(result, tp.Iterator)
     assert list(result) == ground_truth
+
+
+def test_tee() -> None:
+    data = [{'id': i} for i in range(100)]
+
+    tee = ops.Tee(iter(data), 3, buffer_size=8)
+    first, second, third = tee.consumer(), tee.consumer(), tee.consumer()
+
+    assert list(first) == data
+    assert [next(second) for _ in range(10)] == data[:10]
+    assert list(third) == data
+    assert list(second) == data[10:]
+
+
+def test_fused_map() -> None:
+    data = [
+        {'id': 1, 'text': 'Hello, World!'},
+        {'id': 2, 'text': 'one two THREE'},
+        {'id': 3, 'text': ''},
+    ]
+    mappers = [ops.FilterPunctuation('text'), ops.LowerCase('text'), ops.Split('text'),
+               ops.Filter(lambda row: row['text'] != 'two'), ops.Project(['text'])]
+
+    expected: tp.Iterable[ops.TRow] = copy.deepcopy(data)
+    for mapper in mappers:
+        expected = ops.Map(mapper)(expected)
+
+    result = ops.FusedMap(mappers)(iter(copy.deepcopy(data)))
+    assert isinstance(result, tp.Iterator)
+    assert list(result) == list(expected)
+
+
+def test_sort_ordering() -> None:
+    sort = ops.ExternalSort(['doc'])
+    assert sort.ordering(()) == (('doc', False),)
+    assert sort.is_redundant((('doc', False), ('text', False)))
+    assert not sort.is_redundant((('doc', True),))
+    assert not sort.is_redundant((('text', False), ('doc', False)))
+
+    group_sort = ops.ExternalSort(['score'], reverse=True, group_keys=['doc'])
+    assert group_sort.ordering((('doc', False),)) == (('doc', False), ('score', True))
+    assert group_sort.ordering((('text', False),)) == ()
+    assert group_sort.is_redundant((('doc', False), ('score', True), ('text', False)))
+
+    assert ops.Map(ops.Project(['doc', 'score'])).ordering((('doc', False), ('text', False))) == (('doc', False),)
+    assert ops.Reduce(ops.Count('n'), ['doc']).ordering((('doc', False), ('text', False))) == (('doc', False),)
+
+    join = ops.Join(ops.InnerJoiner(), ['doc'])
+    assert join.ordering((('doc', False), ('text', False)), (('doc', False),)) == (('doc', False),)
+    assert join.ordering((('doc', True),), (('doc', True),)) == ()
+
+
+def test_project_ignore_missing() -> None:
+    data = [{'a': 1, 'b': 2, 'c': 3}, {'b': 4}]
+    result = ops.Map(ops.Project(['c', 'a'], ignore_missing=True))(iter(data))
+    assert list(result) == [{'a': 1, 'c': 3}, {}]
+
+
+def test_join_filtered_inputs() -> None:
+    columns_a, columns_b = frozenset(['key', 'value']), frozenset(['key', 'name', 'value2'])
+    join = ops.Join(ops.LeftJoiner(), ['key'])
+    assert join.filtered_inputs(frozenset(['key']), None, None) == (True, True)
+    assert join.filtered_inputs(frozenset(['value']), None, columns_b) == (False, False)
+    assert join.filtered_inputs(frozenset(['value']), columns_a, columns_b) == (True, False)
+    assert join.filtered_inputs(frozenset(['name']), columns_a, columns_b) == (False, False)
+
+    join = ops.Join(ops.InnerJoiner(), ['key'])
+    assert join.filtered_inputs(frozenset(['name']), columns_a, columns_b) == (False, True)
+    assert join.output_columns(columns_a, columns_b | {'value'}) == frozenset(
+        ['key', 'value_1', 'value_2', 'name', 'value2'])
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_parallel_map(ordered: bool) -> None:
+    data = [{'id': i, 'text': f'{i} {i + 1}'} for i in range(1000)]
+    expected = list(ops.Map(ops.Split('text'))(copy.deepcopy(data)))
+
+    result = ops.ParallelMap(ops.Split('text'), workers=3, chunk_size=64, ordered=ordered)(iter(data))
+    assert isinstance(result, tp.Iterator)
+    result_list = list(result)
+    if ordered:
+        assert result_list == expected
+    else:
+        assert sorted(result_list, key=_Key('id', 'text')) == sorted(expected, key=_Key('id', 'text'))
+
+
+def test_parallel_map_error() -> None:
+    data = [{'id': i, 'value': 1 / (i + 1)} for i in range(100)] + [{'id': 100}]
+    with pytest.raises(KeyError):
+        list(ops.ParallelMap(ops.Product(['value']), workers=2, chunk_size=10, ordered=False)(iter(data)))
+
+
+@pytest.mark.parametrize('merge', [True, False])
+def test_shuffle_reduce(merge: bool) -> None:
+    data = [{'word': f'w{i % 37}', 'doc': i % 5, 'n': i} for i in range(2000)]
+    key_func = _Key('word', 'doc')
+    expected = list(ops.Reduce(ops.Sum('n'), ('word', 'doc'))(sorted(data, key=itemgetter('word', 'doc'))))
+
+    result = ops.ShuffleReduce(ops.Sum('n'), ('word', 'doc'), partitions=4, merge=merge, chunk_size=50)(iter(data))
+    assert isinstance(result, tp.Iterator)
+    result_list = list(result)
+    if merge:
+        assert result_list == expected
+    else:
+        assert sorted(result_list, key=key_func) == sorted(expected, key=key_func)
+
+    assert list(ops.ShuffleReduce(ops.Count('count'), (), partitions=4)(iter(data))) == [{'count': 2000}]
+    assert list(ops.ShuffleReduce(ops.Count('count'), ('word',), partitions=4)(iter([]))) == []
+
+
+def test_shuffle_reduce_unhashable_keys() -> None:
+    data = [{'start': [i % 3, 0.5], 'n': i} for i in range(30)]
+
+    result = ops.ShuffleReduce(ops.Count('count'), ('start',), partitions=2)(iter(data))
+    assert list(result) == [{'start': [0, 0.5], 'count': 10}, {'start': [1, 0.5], 'count': 10},
+                            {'start': [2, 0.5], 'count': 10}]
+
+
+def test_sort_rows() -> None:
+    data = [{'key': i % 7, 'n': i} for i in range(100)]
+    expected = sorted(data, key=itemgetter('key'))
+
+    assert list(ops.sort_rows(iter(data), itemgetter('key'), chunk_size=10)) == expected
+    assert list(ops.sort_rows(iter(data), itemgetter('key'), chunk_size=1000)) == expected